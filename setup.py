@@ -11,7 +11,7 @@ setup(
         "PyYAML>=6.0.1",
         "Pillow>=10.1.0",
         "mutagen>=1.47.0",
-        "PyPDF2>=3.0.1",
+        "pypdf>=3.17.0",
         "python-magic>=0.4.27",
     ],
     python_requires=">=3.8",
@@ -2,10 +2,36 @@
 Configuration manager for DL_Assistant
 """
 import os
+import time
 import yaml
 import json
+import pickle
+import functools
 from pathlib import Path
-from typing import Dict, Any, Optional
+from types import MappingProxyType
+from typing import Dict, Any, Mapping, Optional
+
+# Prefer the libyaml C loader when PyYAML was built with it
+try:
+    from yaml import CSafeLoader as _YamlLoader
+except ImportError:
+    from yaml import SafeLoader as _YamlLoader
+
+try:
+    import orjson
+    HAS_ORJSON = True
+except ImportError:
+    HAS_ORJSON = False
+
+# Sentinel distinguishing "key missing" from a stored None
+_MISSING = object()
+
+
+def _dump_json(obj: Any) -> bytes:
+    """Serialize config to JSON bytes, preferring orjson when installed"""
+    if HAS_ORJSON:
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2)
+    return json.dumps(obj, indent=2).encode()
 
 
 class ConfigManager:
@@ -28,41 +54,113 @@ class ConfigManager:
         self.default_config_path = self.config_dir / "default_config.yaml"
         self.user_config_path = self.config_dir / "user_config.json"
         
-        self.config = self._load_config()
-    
+        self._config = self._load_config()
+        self._config_view = MappingProxyType(self._config)
+        self._config_mtime = self._config_files_mtime()
+        self._last_reload_check = time.monotonic()
+        # Per-instance memo of dotted-key lookups; cleared on set()
+        self._resolve_key = functools.lru_cache(maxsize=256)(self._resolve_key_uncached)
+
+    @property
+    def config(self) -> Dict[str, Any]:
+        """Current configuration dict, reloaded lazily if files changed"""
+        self._reload_if_changed()
+        return self._config
+
+    def _config_files_mtime(self) -> int:
+        """Newest mtime (ns) across the config files"""
+        mtime = 0
+        for path in (self.default_config_path, self.user_config_path):
+            try:
+                mtime = max(mtime, path.stat().st_mtime_ns)
+            except OSError:
+                pass
+        return mtime
+
+    def _reload_if_changed(self) -> None:
+        """
+        Reload the config if another process rewrote the files
+
+        The mtime probe is throttled to once per second so hot-path
+        lookups don't pay two stat calls each.
+        """
+        now = time.monotonic()
+        if now - self._last_reload_check < 1.0:
+            return
+        self._last_reload_check = now
+
+        mtime = self._config_files_mtime()
+        if mtime != self._config_mtime:
+            self._config = self._load_config()
+            self._config_view = MappingProxyType(self._config)
+            self._config_mtime = mtime
+            self._resolve_key.cache_clear()
+
     def _load_config(self) -> Dict[str, Any]:
         """Load configuration from files"""
-        # Load default config
-        config = {}
-        if self.default_config_path.exists():
-            with open(self.default_config_path, 'r') as f:
-                config = yaml.safe_load(f)
-        
+        # Load default config (served from the pickle cache when fresh)
+        config = self._load_default_config()
+
         # Override with user config if exists
         if self.user_config_path.exists():
             with open(self.user_config_path, 'r') as f:
                 user_config = json.load(f)
-                config.update(user_config)
-        
-        # Expand paths
+                config.update(self._expand_paths(user_config))
+
+        return config
+
+    def _load_default_config(self) -> Dict[str, Any]:
+        """
+        Load the default YAML config, using a pickle side-cache when possible
+
+        Parsing YAML is the dominant startup cost, so the fully-expanded
+        default config is cached to a sibling pickle file keyed on the
+        YAML file's mtime. A stale or unreadable cache falls back to
+        parsing the YAML and rewriting the cache.
+        """
+        if not self.default_config_path.exists():
+            return {}
+
+        cache_path = self.default_config_path.with_suffix('.yaml.cache.pkl')
+
+        # Use the cache if it's at least as new as the YAML file
+        try:
+            if (cache_path.exists() and
+                    cache_path.stat().st_mtime >= self.default_config_path.stat().st_mtime):
+                with open(cache_path, 'rb') as f:
+                    return pickle.load(f)
+        except (OSError, pickle.UnpicklingError, EOFError):
+            pass
+
+        with open(self.default_config_path, 'r') as f:
+            config = yaml.load(f, Loader=_YamlLoader) or {}
+
         config = self._expand_paths(config)
-        
+
+        # Write the cache; failure here is non-fatal
+        try:
+            with open(cache_path, 'wb') as f:
+                pickle.dump(config, f, protocol=pickle.HIGHEST_PROTOCOL)
+        except OSError:
+            pass
+
         return config
     
-    def _expand_paths(self, config: Dict[str, Any]) -> Dict[str, Any]:
+    def _expand_paths(self, config: Any) -> Any:
         """Expand ~ and environment variables in paths"""
+        if isinstance(config, str):
+            # Only call the expanders when they can actually do something;
+            # each one is a full string scan of its own
+            if '$' in config:
+                config = os.path.expandvars(config)
+            if '~' in config:
+                config = os.path.expanduser(config)
+            return config
         if isinstance(config, dict):
-            for key, value in config.items():
-                if isinstance(value, str) and ('/' in value or '~' in value):
-                    config[key] = os.path.expanduser(os.path.expandvars(value))
-                elif isinstance(value, (dict, list)):
-                    config[key] = self._expand_paths(value)
-        elif isinstance(config, list):
-            config = [self._expand_paths(item) if isinstance(item, (dict, list, str)) 
-                     else item for item in config]
-            config = [os.path.expanduser(os.path.expandvars(item)) if isinstance(item, str) 
-                     and ('/' in item or '~' in item) else item for item in config]
-        
+            return {key: self._expand_paths(value) for key, value in config.items()}
+        if isinstance(config, list):
+            return [self._expand_paths(item) for item in config]
+
         return config
     
     def get(self, key: str, default: Any = None) -> Any:
@@ -76,47 +174,79 @@ class ConfigManager:
         Returns:
             Configuration value
         """
-        keys = key.split('.')
-        value = self.config
-        
-        for k in keys:
+        self._reload_if_changed()
+        value = self._resolve_key(key)
+        return default if value is _MISSING else value
+
+    def _resolve_key_uncached(self, key: str) -> Any:
+        """Walk the config dict along a dotted key"""
+        value = self._config
+
+        for k in key.split('.'):
             if isinstance(value, dict) and k in value:
                 value = value[k]
             else:
-                return default
-        
+                return _MISSING
+
         return value
     
     def set(self, key: str, value: Any) -> None:
         """
         Set configuration value (saves to user config)
-        
+
         Args:
             key: Configuration key (supports dot notation)
             value: Value to set
         """
+        self._set_no_save(key, value)
+        self._save_user_config()
+
+    def set_many(self, items: Dict[str, Any]) -> None:
+        """
+        Set several configuration values with a single save
+
+        Args:
+            items: Mapping of configuration keys (dot notation) to values
+        """
+        for key, value in items.items():
+            self._set_no_save(key, value)
+        self._save_user_config()
+
+    def _set_no_save(self, key: str, value: Any) -> None:
+        """Set a value in the in-memory config without persisting"""
         keys = key.split('.')
         config = self.config
-        
+
         # Navigate to the parent dict
         for k in keys[:-1]:
             if k not in config:
                 config[k] = {}
             config = config[k]
-        
+
         # Set the value
         config[keys[-1]] = value
-        
-        # Save user config
-        self._save_user_config()
+        self._resolve_key.cache_clear()
     
     def _save_user_config(self) -> None:
         """Save current configuration to user config file"""
         self.config_dir.mkdir(parents=True, exist_ok=True)
-        
-        with open(self.user_config_path, 'w') as f:
-            json.dump(self.config, f, indent=2)
+
+        # Write to a temp file and rename so a crash mid-write can't
+        # leave a corrupt user config behind
+        tmp_path = self.user_config_path.with_suffix('.json.tmp')
+        with open(tmp_path, 'wb') as f:
+            f.write(_dump_json(self._config))
+        os.replace(tmp_path, self.user_config_path)
+
+        # Our own write shouldn't look like an external change
+        self._config_mtime = self._config_files_mtime()
     
-    def get_all(self) -> Dict[str, Any]:
-        """Get all configuration"""
-        return self.config.copy()
+    def get_all(self) -> Mapping[str, Any]:
+        """
+        Get all configuration as a read-only view
+
+        Mutation must go through set()/set_many(); callers needing a
+        mutable copy can wrap the result in dict().
+        """
+        self._reload_if_changed()
+        return self._config_view
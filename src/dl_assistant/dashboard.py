@@ -1,14 +1,61 @@
 """
 Web dashboard for DL_Assistant configuration
 """
-from flask import Flask, render_template, request, jsonify, send_from_directory
+from flask import Flask, Response, render_template, request, jsonify, send_from_directory
 import os
 import json
 from pathlib import Path
 
+try:
+    import orjson
+    HAS_ORJSON = True
+except ImportError:
+    HAS_ORJSON = False
+
 from .config import ConfigManager
 
 
+def _json_response(obj):
+    """Serialize a JSON response with orjson when installed"""
+    if HAS_ORJSON:
+        return Response(orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS),
+                        mimetype='application/json')
+    return jsonify(obj)
+
+
+def _load_secret_key(config_manager: 'ConfigManager') -> str:
+    """
+    Load or create the session-signing secret
+
+    The secret lives in its own file under the config dir — never in
+    the config dict, which the API and index template publish.
+    """
+    secret_path = Path(config_manager.config_dir) / 'flask_secret.key'
+    try:
+        secret = secret_path.read_text().strip()
+        if secret:
+            return secret
+    except OSError:
+        pass
+
+    # Migrate a secret an earlier version persisted into the config
+    secret = config_manager.get('flask_secret_key') or os.urandom(24).hex()
+    try:
+        secret_path.parent.mkdir(parents=True, exist_ok=True)
+        secret_path.write_text(secret)
+        os.chmod(secret_path, 0o600)
+    except OSError:
+        pass
+    return secret
+
+
+def _public_config(config_manager: 'ConfigManager') -> dict:
+    """Mutable copy of the config with secrets stripped"""
+    config = dict(config_manager.get_all())
+    config.pop('flask_secret_key', None)
+    return config
+
+
 def create_app(config_manager: ConfigManager):
     """
     Create Flask application
@@ -20,7 +67,10 @@ def create_app(config_manager: ConfigManager):
         Flask app
     """
     app = Flask(__name__)
-    app.config['SECRET_KEY'] = os.urandom(24)
+
+    # Persist the secret so sessions survive restarts and repeated
+    # create_app calls don't each draw fresh entropy
+    app.config['SECRET_KEY'] = _load_secret_key(config_manager)
     
     # Store config manager in app context
     app.config_manager = config_manager
@@ -28,13 +78,13 @@ def create_app(config_manager: ConfigManager):
     @app.route('/')
     def index():
         """Dashboard home page"""
-        config = config_manager.get_all()
-        return render_template('index.html', config=config)
-    
+        return render_template('index.html', config=_public_config(config_manager))
+
     @app.route('/api/config', methods=['GET'])
     def get_config():
         """Get current configuration"""
-        return jsonify(config_manager.get_all())
+        # JSON serializers need a real dict, not the read-only view
+        return _json_response(_public_config(config_manager))
     
     @app.route('/api/config', methods=['POST'])
     def update_config():
@@ -42,8 +92,7 @@ def create_app(config_manager: ConfigManager):
         data = request.json
         
         try:
-            for key, value in data.items():
-                config_manager.set(key, value)
+            config_manager.set_many(data)
             return jsonify({'success': True, 'message': 'Configuration updated'})
         except Exception as e:
             return jsonify({'success': False, 'error': str(e)}), 400
@@ -51,6 +100,9 @@ def create_app(config_manager: ConfigManager):
     @app.route('/api/config/<path:key>', methods=['GET'])
     def get_config_value(key):
         """Get specific configuration value"""
+        # Never serve the legacy secret over the API
+        if key == 'flask_secret_key':
+            return jsonify({'key': key, 'value': None})
         value = config_manager.get(key)
         return jsonify({'key': key, 'value': value})
     
@@ -71,19 +123,24 @@ def create_app(config_manager: ConfigManager):
         quarantine_folder = config_manager.get('quarantine_folder')
         
         if not os.path.exists(quarantine_folder):
-            return jsonify({'files': []})
-        
+            return _json_response({'files': []})
+
         files = []
-        for filename in os.listdir(quarantine_folder):
-            file_path = os.path.join(quarantine_folder, filename)
-            if os.path.isfile(file_path):
-                files.append({
-                    'name': filename,
-                    'size': os.path.getsize(file_path),
-                    'modified': os.path.getmtime(file_path)
-                })
-        
-        return jsonify({'files': files})
+        with os.scandir(quarantine_folder) as it:
+            for entry in it:
+                if entry.is_file(follow_symlinks=False):
+                    st = entry.stat()
+                    files.append({
+                        'name': entry.name,
+                        'size': st.st_size,
+                        'modified': st.st_mtime
+                    })
+
+        # Let repeat polls short-circuit with a 304 while the folder
+        # is unchanged
+        response = _json_response({'files': files})
+        response.set_etag(str(os.path.getmtime(quarantine_folder)))
+        return response.make_conditional(request)
     
     return app
 
@@ -98,4 +155,10 @@ def run_dashboard(config_manager: ConfigManager, host: str = '127.0.0.1', port:
         port: Port to bind to
     """
     app = create_app(config_manager)
-    app.run(host=host, port=port, debug=False)
+    try:
+        from waitress import serve
+    except ImportError:
+        # Fall back to the Werkzeug dev server, at least with threads
+        app.run(host=host, port=port, debug=False, threaded=True)
+    else:
+        serve(app, host=host, port=port, threads=8)
@@ -2,16 +2,53 @@
 File management utilities for DL_Assistant
 """
 import os
+import filecmp
 import hashlib
+import mmap
+import shelve
 import shutil
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from typing import Dict, List, Optional, Tuple
+
+# BLAKE3 is several times faster than SHA256 for equality checks; fall
+# back to hashlib when it isn't installed
+try:
+    import blake3
+    HAS_BLAKE3 = True
+except ImportError:
+    HAS_BLAKE3 = False
+
 from .metadata import MetadataExtractor
 
+# Digests are only compared with each other, so the cache keys carry
+# the algorithm name to keep the two kinds apart
+_HASH_ALGO = 'blake3' if HAS_BLAKE3 else 'sha256'
+
 
 class FileManager:
     """Handles file operations like renaming, moving, and duplicate detection"""
-    
+
+    # Translation table mapping invalid filename characters to '_'
+    _SANITIZE_TABLE = str.maketrans({c: '_' for c in '<>:"/\\|?*'})
+
+    # Below this size, byte-for-byte comparison beats hashing
+    _SMALL_FILE_THRESHOLD = 64 * 1024
+
+    # Safe defaults for every placeholder a naming pattern may reference
+    _FORMAT_DEFAULTS = {
+        'artist': '',
+        'title': '',
+        'album': '',
+        'year': '',
+        'content_rating': '',
+        'video_type': '',
+        'version': '',
+        'description': '',
+    }
+
+
     def __init__(self, config):
         """
         Initialize file manager
@@ -23,6 +60,12 @@ class FileManager:
         # Check if vision should be enabled
         use_vision = config.get('vision_enabled', True)
         self.metadata_extractor = MetadataExtractor(use_vision=use_vision)
+        self._hash_cache = None
+        self._hash_cache_lock = threading.Lock()
+        self._hash_pool = None
+        self._hash_pool_lock = threading.Lock()
+        self._ext_to_category = {}
+        self._ext_map_source = None
     
     def get_file_type(self, file_path: str) -> str:
         """
@@ -34,14 +77,19 @@ class FileManager:
         Returns:
             File type category (images, documents, music, videos, archives, or unknown)
         """
-        ext = Path(file_path).suffix.lower().lstrip('.')
         file_types = self.config.get('file_types', {})
-        
-        for category, extensions in file_types.items():
-            if ext in extensions:
-                return category
-        
-        return 'unknown'
+
+        # Rebuild the reverse map only when the config mapping is replaced
+        if file_types is not self._ext_map_source:
+            self._ext_to_category = {
+                str(ext).lower(): category
+                for category, extensions in file_types.items()
+                for ext in extensions
+            }
+            self._ext_map_source = file_types
+
+        ext = Path(file_path).suffix.lower().lstrip('.')
+        return self._ext_to_category.get(ext, 'unknown')
     
     def generate_new_filename(self, file_path: str, file_type: str) -> str:
         """
@@ -150,23 +198,12 @@ class FileManager:
             Metadata with safe defaults for all placeholders
         """
         safe_metadata = metadata.copy()
-        
+
         # Ensure all common placeholders have values
-        defaults = {
-            'artist': '',
-            'title': '',
-            'album': '',
-            'year': '',
-            'content_rating': '',
-            'video_type': '',
-            'version': '',
-            'description': '',
-        }
-        
-        for key, default_value in defaults.items():
-            if key not in safe_metadata or safe_metadata[key] is None:
+        for key, default_value in self._FORMAT_DEFAULTS.items():
+            if safe_metadata.get(key) is None:
                 safe_metadata[key] = default_value
-        
+
         return safe_metadata
     
     def _sanitize_filename(self, filename: str) -> str:
@@ -179,10 +216,7 @@ class FileManager:
         Returns:
             Sanitized filename
         """
-        invalid_chars = '<>:"/\\|?*'
-        for char in invalid_chars:
-            filename = filename.replace(char, '_')
-        return filename
+        return filename.translate(self._SANITIZE_TABLE)
     
     def get_destination_folder(self, file_type: str) -> Optional[str]:
         """
@@ -203,70 +237,208 @@ class FileManager:
         
         return None
     
-    def calculate_file_hash(self, file_path: str, chunk_size: int = 8192) -> str:
+    def _get_hash_pool(self) -> ThreadPoolExecutor:
+        """Shared worker pool for parallel hashing, created on first use"""
+        # find_duplicates runs concurrently on the watcher workers, so
+        # creation is locked to keep a losing thread from leaking a
+        # second executor
+        if self._hash_pool is None:
+            with self._hash_pool_lock:
+                if self._hash_pool is None:
+                    self._hash_pool = ThreadPoolExecutor(
+                        max_workers=min(8, os.cpu_count() or 1))
+        return self._hash_pool
+
+    def _get_hash_cache(self):
+        """Open the persistent hash cache on first use"""
+        if self._hash_cache is None:
+            cache_path = os.path.expanduser(
+                self.config.get('hash_cache_path', '~/.cache/dl_assistant/hashes.db'))
+            try:
+                os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+                self._hash_cache = shelve.open(cache_path)
+            except OSError:
+                # Fall back to an in-process cache for this run
+                self._hash_cache = {}
+        return self._hash_cache
+
+    def close(self) -> None:
+        """Release the persistent hash cache and the hashing pool"""
+        with self._hash_cache_lock:
+            if self._hash_cache is not None and hasattr(self._hash_cache, 'close'):
+                self._hash_cache.close()
+            self._hash_cache = None
+        if self._hash_pool is not None:
+            self._hash_pool.shutdown(wait=True)
+            self._hash_pool = None
+
+    def calculate_file_hash(self, file_path: str, chunk_size: int = 1024 * 1024) -> str:
         """
-        Calculate SHA256 hash of a file
-        
+        Calculate the content hash of a file (BLAKE3 if installed, else SHA256)
+
+        Results are memoized by (device, inode, size, mtime) in a
+        persistent cache so reference files in destination folders are
+        not re-hashed on every scan.
+
         Args:
             file_path: Path to the file
-            chunk_size: Size of chunks to read
-            
+            chunk_size: Size of chunks to read (fallback path only)
+
         Returns:
-            Hexadecimal hash string
+            Hexadecimal hash string (64 chars for either algorithm)
         """
-        sha256_hash = hashlib.sha256()
-        
-        with open(file_path, "rb") as f:
+        st = os.stat(file_path)
+        key = f"{_HASH_ALGO}:{st.st_dev}:{st.st_ino}:{st.st_size}:{st.st_mtime_ns}"
+
+        with self._hash_cache_lock:
+            cached = self._get_hash_cache().get(key)
+        if cached is not None:
+            return cached
+
+        file_hash = self._hash_file(file_path, chunk_size)
+        with self._hash_cache_lock:
+            try:
+                self._get_hash_cache()[key] = file_hash
+            except OSError:
+                pass
+        return file_hash
+
+    @staticmethod
+    def _hash_file(file_path: str, chunk_size: int = 1024 * 1024) -> str:
+        """Compute the content digest of a file"""
+        with open(file_path, "rb", buffering=0) as f:
+            # Large files: hash a read-only mapping in one call, so the
+            # hasher's inner loop runs without per-chunk read syscalls
+            # or buffer copies. Below 64 KiB the mmap setup costs more
+            # than it saves.
+            if os.fstat(f.fileno()).st_size > 64 * 1024:
+                try:
+                    with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                        if hasattr(mmap, 'MADV_SEQUENTIAL'):
+                            mm.madvise(mmap.MADV_SEQUENTIAL)
+                        if HAS_BLAKE3:
+                            return blake3.blake3(
+                                mm, max_threads=blake3.blake3.AUTO).hexdigest()
+                        return hashlib.sha256(mm).hexdigest()
+                except (ValueError, OSError):
+                    # Mapping can fail (e.g. odd filesystems); read instead
+                    f.seek(0)
+
+            if HAS_BLAKE3:
+                # BLAKE3 hashes chunks in SIMD-parallel across cores
+                hasher = blake3.blake3(max_threads=blake3.blake3.AUTO)
+                for chunk in iter(lambda: f.read(chunk_size), b""):
+                    hasher.update(chunk)
+                return hasher.hexdigest()
+
+            # Python 3.11+: read-and-update loop runs in C and releases the GIL
+            if hasattr(hashlib, 'file_digest'):
+                return hashlib.file_digest(f, 'sha256').hexdigest()
+
+            sha256_hash = hashlib.sha256()
             for chunk in iter(lambda: f.read(chunk_size), b""):
                 sha256_hash.update(chunk)
-        
-        return sha256_hash.hexdigest()
+            return sha256_hash.hexdigest()
     
-    def find_duplicates(self, file_path: str, search_dir: str) -> List[str]:
+    def _scan_files(self, search_dir: str) -> List[Tuple[str, os.stat_result]]:
+        """
+        Recursively collect (path, stat result) pairs under a directory
+
+        Uses os.scandir so stat data comes from the DirEntry cache
+        instead of a separate stat() call per file.
+
+        Args:
+            search_dir: Directory to scan
+
+        Returns:
+            List of (path, stat_result) tuples
+        """
+        entries = []
+
+        try:
+            with os.scandir(search_dir) as it:
+                for entry in it:
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            entries.extend(self._scan_files(entry.path))
+                        elif entry.is_file(follow_symlinks=False):
+                            entries.append((entry.path, entry.stat(follow_symlinks=False)))
+                    except OSError:
+                        continue
+        except OSError:
+            pass
+
+        return entries
+
+    def find_duplicates(self, file_path: str, search_dir: str,
+                        file_stat: Optional[os.stat_result] = None,
+                        candidates: Optional[List[str]] = None) -> List[str]:
         """
         Find duplicate files in a directory
-        
+
+        Files are prefiltered by size so only candidates whose size
+        matches the target file are ever hashed.
+
         Args:
             file_path: Path to the file to check
             search_dir: Directory to search for duplicates
-            
+            file_stat: Optional pre-fetched stat for file_path
+            candidates: Optional pre-selected candidate paths (e.g. from
+                a size index), replacing the directory scan
+
         Returns:
             List of paths to duplicate files
         """
-        duplicates = []
-        
         if not os.path.exists(search_dir):
-            return duplicates
-        
+            return []
+
         compare_method = self.config.get('duplicate_detection.compare_method', 'hash')
-        file_size = os.path.getsize(file_path)
-        file_hash = None
-        
-        if compare_method in ['hash', 'both']:
-            file_hash = self.calculate_file_hash(file_path)
-        
-        # Search for duplicates
-        for root, dirs, files in os.walk(search_dir):
-            for file in files:
-                other_path = os.path.join(root, file)
-                
-                # Skip the file itself
-                if os.path.samefile(file_path, other_path):
+        if file_stat is None:
+            file_stat = os.stat(file_path)
+        file_size = file_stat.st_size
+
+        # Pass 1: collect same-size candidates. With caller-provided
+        # candidates only those few paths are stat'd (they may have
+        # changed since they were indexed); otherwise scan the
+        # directory, where stat data is free via scandir.
+        if candidates is not None:
+            scan = []
+            for other_path in candidates:
+                try:
+                    scan.append((other_path, os.stat(other_path)))
+                except OSError:
                     continue
-                
-                # Check if it's a duplicate
-                if compare_method == 'size':
-                    if os.path.getsize(other_path) == file_size:
-                        duplicates.append(other_path)
-                elif compare_method == 'hash':
-                    if self.calculate_file_hash(other_path) == file_hash:
-                        duplicates.append(other_path)
-                elif compare_method == 'both':
-                    if (os.path.getsize(other_path) == file_size and
-                        self.calculate_file_hash(other_path) == file_hash):
-                        duplicates.append(other_path)
-        
-        return duplicates
+        else:
+            scan = self._scan_files(search_dir)
+
+        same_size = []
+        for other_path, other_stat in scan:
+            if other_stat.st_size != file_size:
+                continue
+            if os.path.samestat(file_stat, other_stat):
+                continue
+            same_size.append(other_path)
+
+        if compare_method == 'size' or not same_size:
+            return same_size
+
+        # Small files: compare bytes directly — it short-circuits on the
+        # first differing byte and skips hash setup entirely
+        if file_size <= self._SMALL_FILE_THRESHOLD:
+            return [other_path for other_path in same_size
+                    if filecmp.cmp(file_path, other_path, shallow=False)]
+
+        # Pass 2: hash only the size-matched candidates. hashlib releases
+        # the GIL, so hashing several candidates in threads overlaps I/O
+        # and digest computation.
+        file_hash = self.calculate_file_hash(file_path)
+        if len(same_size) > 1:
+            hashes = list(self._get_hash_pool().map(self.calculate_file_hash, same_size))
+        else:
+            hashes = [self.calculate_file_hash(other_path) for other_path in same_size]
+
+        return [other_path for other_path, other_hash in zip(same_size, hashes)
+                if other_hash == file_hash]
     
     def move_file(self, source: str, destination_dir: str, new_filename: Optional[str] = None) -> str:
         """
@@ -289,18 +461,64 @@ class FileManager:
         
         destination = os.path.join(destination_dir, new_filename)
         
-        # Handle name conflicts
+        # Handle name conflicts: enumerate the directory once instead of
+        # probing stat() per candidate name
         if os.path.exists(destination):
+            existing = {entry.name for entry in os.scandir(destination_dir)}
             base, ext = os.path.splitext(new_filename)
             counter = 1
-            while os.path.exists(destination):
-                new_filename = f"{base}_{counter}{ext}"
-                destination = os.path.join(destination_dir, new_filename)
+            while f"{base}_{counter}{ext}" in existing:
                 counter += 1
+            new_filename = f"{base}_{counter}{ext}"
+            destination = os.path.join(destination_dir, new_filename)
         
-        # Move the file
-        shutil.move(source, destination)
+        # Move the file: same-filesystem moves are a single rename(2),
+        # cross-device moves copy in-kernel where supported and fall
+        # back to shutil's read/write loop otherwise
+        try:
+            same_device = os.stat(source).st_dev == os.stat(destination_dir).st_dev
+        except OSError:
+            same_device = False
+
+        if same_device:
+            os.replace(source, destination)
+        elif not self._kernel_copy_move(source, destination):
+            shutil.move(source, destination)
         return destination
+
+    @staticmethod
+    def _kernel_copy_move(source: str, destination: str) -> bool:
+        """
+        Move a file across devices using os.copy_file_range
+
+        The kernel copies the bytes directly (server-side on NFSv4.2,
+        reflink on supporting filesystems), skipping the userspace
+        read/write round trip. Returns False — with the source intact —
+        when the syscall is unavailable or the filesystems reject it.
+        """
+        if not hasattr(os, 'copy_file_range'):
+            return False
+
+        try:
+            with open(source, 'rb') as src, open(destination, 'wb') as dst:
+                remaining = os.fstat(src.fileno()).st_size
+                while remaining > 0:
+                    copied = os.copy_file_range(src.fileno(), dst.fileno(), remaining)
+                    if copied == 0:
+                        break
+                    remaining -= copied
+            if remaining > 0:
+                raise OSError("short copy")
+            shutil.copystat(source, destination)
+            os.unlink(source)
+            return True
+        except OSError:
+            # Leave no partial destination behind for the fallback
+            try:
+                os.unlink(destination)
+            except OSError:
+                pass
+            return False
     
     def quarantine_file(self, file_path: str) -> str:
         """
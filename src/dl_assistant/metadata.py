@@ -1,29 +1,15 @@
 """
 Metadata extraction for various file types
 """
+import io
 import os
-from pathlib import Path
+import json
+import shutil
+import functools
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from typing import Dict, Any, Optional
-
-try:
-    from PIL import Image
-    from PIL.ExifTags import TAGS
-    HAS_PIL = True
-except ImportError:
-    HAS_PIL = False
-
-try:
-    from mutagen import File as MutagenFile
-    HAS_MUTAGEN = True
-except ImportError:
-    HAS_MUTAGEN = False
-
-try:
-    from PyPDF2 import PdfReader
-    HAS_PYPDF2 = True
-except ImportError:
-    HAS_PYPDF2 = False
+from typing import Dict, Any, List, Optional, Set, Tuple
 
 try:
     from .vision import VisionAnalyzer
@@ -32,6 +18,94 @@ except ImportError:
     HAS_VISION = False
 
 
+# Heavy parsers are imported on first use so a process that never
+# touches their file type doesn't pay their import cost
+
+@functools.lru_cache(maxsize=1)
+def _pil_image():
+    """Load PIL's Image lazily, or None when Pillow is missing"""
+    try:
+        from PIL import Image
+        return Image
+    except ImportError:
+        return None
+
+
+@functools.lru_cache(maxsize=1)
+def _mutagen_file():
+    """Load mutagen's File lazily, or None when mutagen is missing"""
+    try:
+        from mutagen import File as MutagenFile
+        return MutagenFile
+    except ImportError:
+        return None
+
+
+@functools.lru_cache(maxsize=1)
+def _pdf_reader():
+    """Load a PdfReader lazily, preferring pypdf over PyPDF2"""
+    try:
+        from pypdf import PdfReader
+        return PdfReader
+    except ImportError:
+        try:
+            from PyPDF2 import PdfReader
+            return PdfReader
+        except ImportError:
+            return None
+
+_IMAGE_EXTS = ('jpg', 'jpeg', 'png', 'gif', 'bmp')
+_AUDIO_EXTS = ('mp3', 'wav', 'wave', 'flac', 'm4a', 'aac', 'ogg')
+_VIDEO_EXTS = ('mp4', 'avi', 'mkv', 'mov', 'wmv', 'flv', 'webm')
+
+# Extension → handler-method dispatch, resolved with one dict lookup
+_EXTRACT_HANDLERS = {ext: '_extract_image_metadata' for ext in _IMAGE_EXTS}
+_EXTRACT_HANDLERS.update({ext: '_extract_audio_metadata' for ext in _AUDIO_EXTS})
+_EXTRACT_HANDLERS.update({ext: '_extract_video_metadata' for ext in _VIDEO_EXTS})
+_EXTRACT_HANDLERS['pdf'] = '_extract_pdf_metadata'
+
+# Extensions the vision analyzer can handle
+_VISION_EXTS = frozenset(_IMAGE_EXTS + ('webp',) + _VIDEO_EXTS)
+
+# ffprobe reads container metadata without decoding any frames
+_FFPROBE = shutil.which('ffprobe')
+
+# EXIF tags worth extracting, by numeric id — avoids resolving every
+# tag id through PIL's ~300-entry TAGS mapping
+_WANTED_EXIF = {
+    0x0132: 'DateTime',
+    0x010E: 'ImageDescription',
+}
+
+def _valid_exif_datetime(value: str) -> bool:
+    """
+    Check that a string follows the 'YYYY:MM:DD HH:MM:SS' EXIF layout
+
+    Cameras with an unset clock write the zeroed placeholder
+    '0000:00:00 00:00:00', and some writers use nonstandard separators;
+    both must fall through to the mtime-derived defaults.
+    """
+    if len(value) < 19:
+        return False
+    if not (value[4] == value[7] == ':' and value[10] == ' '
+            and value[13] == value[16] == ':'):
+        return False
+    digits = (value[0:4] + value[5:7] + value[8:10]
+              + value[11:13] + value[14:16] + value[17:19])
+    if not digits.isdigit():
+        return False
+    return value[0:10] != '0000:00:00'
+
+
+# Reverse map of known ID3/Vorbis/MP4/ASF tag names to metadata fields
+_TAG_TO_FIELD = {
+    'TIT2': 'title', 'title': 'title', '\xa9nam': 'title', 'Title': 'title',
+    'TPE1': 'artist', 'artist': 'artist', '\xa9ART': 'artist', 'Artist': 'artist',
+    'TALB': 'album', 'album': 'album', '\xa9alb': 'album',
+    'TDRC': 'year', 'date': 'year', '\xa9day': 'year',
+}
+
+
 class MetadataExtractor:
     """Extract metadata from various file types"""
     
@@ -45,24 +119,50 @@ class MetadataExtractor:
         self.use_vision = use_vision and HAS_VISION
         if self.use_vision:
             self.vision_analyzer = VisionAnalyzer()
-    
+        # Per-instance memo of extraction results, keyed on
+        # (path, mtime, size) so a rewritten file is re-extracted
+        self._result_cache: Dict[Tuple[str, int, int], Dict[str, Any]] = {}
+
     def extract(self, file_path: str) -> Dict[str, Any]:
         """
         Extract metadata from a file
-        
+
+        Repeated extractions of an unchanged file (e.g. once for naming
+        and once for duplicate handling) are served from an in-memory
+        cache instead of re-parsing the file.
+
         Args:
             file_path: Path to the file
-            
+
         Returns:
             Dictionary containing metadata
         """
-        path = Path(file_path)
+        # One stat covers size/created/modified; os.path avoids the
+        # Path object allocation on this per-file path
+        st = os.stat(file_path)
+
+        cache_key = (file_path, st.st_mtime_ns, st.st_size)
+        cached = self._result_cache.get(cache_key)
+        if cached is not None:
+            # Copy so callers can mutate their result freely
+            return cached.copy()
+
+        metadata = self._extract_uncached(file_path, st)
+
+        if len(self._result_cache) >= 4096:
+            self._result_cache.clear()
+        self._result_cache[cache_key] = metadata
+        return metadata.copy()
+
+    def _extract_uncached(self, file_path: str, st: os.stat_result) -> Dict[str, Any]:
+        """Run the actual extraction for a file, given its stat result"""
+        stem, suffix = os.path.splitext(os.path.basename(file_path))
         metadata = {
-            'filename': path.stem,
-            'ext': path.suffix.lower().lstrip('.'),
-            'size': path.stat().st_size,
-            'created': datetime.fromtimestamp(path.stat().st_ctime),
-            'modified': datetime.fromtimestamp(path.stat().st_mtime),
+            'filename': stem,
+            'ext': suffix.lower().lstrip('.'),
+            'size': st.st_size,
+            'created': datetime.fromtimestamp(st.st_ctime),
+            'modified': datetime.fromtimestamp(st.st_mtime),
         }
         
         # Add formatted date and time
@@ -71,15 +171,10 @@ class MetadataExtractor:
         
         # Try to extract type-specific metadata
         ext = metadata['ext']
-        
-        if ext in ['jpg', 'jpeg', 'png', 'gif', 'bmp']:
-            metadata.update(self._extract_image_metadata(file_path))
-        elif ext in ['mp3', 'wav', 'wave', 'flac', 'm4a', 'aac', 'ogg']:
-            metadata.update(self._extract_audio_metadata(file_path))
-        elif ext in ['mp4', 'avi', 'mkv', 'mov', 'wmv', 'flv', 'webm']:
-            metadata.update(self._extract_video_metadata(file_path))
-        elif ext == 'pdf':
-            metadata.update(self._extract_pdf_metadata(file_path))
+
+        handler = _EXTRACT_HANDLERS.get(ext)
+        if handler:
+            metadata.update(getattr(self, handler)(file_path))
         
         # Use vision AI for enhanced metadata extraction if enabled
         if self.use_vision:
@@ -90,7 +185,39 @@ class MetadataExtractor:
                     metadata[key] = value
         
         return metadata
-    
+
+    def extract_many(self, paths: List[str], max_workers: Optional[int] = None) -> List[Dict[str, Any]]:
+        """
+        Extract metadata from several files concurrently
+
+        Parsing happens inside PIL/mutagen/PyPDF2 C code or network
+        calls, so threads overlap the per-file I/O well.
+
+        Args:
+            paths: Paths to the files
+            max_workers: Thread count (default: min(32, cpu_count * 4))
+
+        Returns:
+            List of metadata dictionaries, in the same order as paths
+        """
+        if not paths:
+            return []
+
+        if max_workers is None:
+            if self.use_vision:
+                # Vision calls are network-bound (hundreds of ms each);
+                # concurrency is limited by API rate, not cores
+                max_workers = 32
+            else:
+                max_workers = min(32, (os.cpu_count() or 1) * 4)
+        max_workers = min(max_workers, len(paths))
+
+        if max_workers <= 1:
+            return [self.extract(path) for path in paths]
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            return list(executor.map(self.extract, paths))
+
     def _extract_vision_metadata(self, file_path: str, ext: str) -> Dict[str, Any]:
         """
         Extract metadata using vision AI
@@ -103,8 +230,7 @@ class MetadataExtractor:
             Dictionary with vision-extracted metadata
         """
         # Only analyze images and videos
-        if ext not in ['jpg', 'jpeg', 'png', 'gif', 'bmp', 'webp',
-                       'mp4', 'avi', 'mkv', 'mov', 'wmv', 'flv', 'webm']:
+        if ext not in _VISION_EXTS:
             return {}
         
         try:
@@ -113,36 +239,88 @@ class MetadataExtractor:
             return {}
     
     @staticmethod
-    def _extract_video_metadata(file_path: str) -> Dict[str, Any]:
-        """Extract metadata from video files"""
+    def _extract_video_metadata(file_path: str, fields: Optional[Set[str]] = None) -> Dict[str, Any]:
+        """
+        Extract metadata from video files
+
+        Args:
+            file_path: Path to the file
+            fields: Optional set of field names to extract; None means all
+        """
         metadata = {}
-        
+
+        tags_needed = fields is None or bool(fields - {'duration'})
+
+        # Prefer ffprobe: it handles the common video containers that
+        # mutagen can't, and never decodes a frame
+        if _FFPROBE:
+            metadata.update(MetadataExtractor._probe_video(file_path))
+
         # Try to extract video metadata using mutagen (works for some video formats)
-        if HAS_MUTAGEN:
+        MutagenFile = _mutagen_file()
+        if MutagenFile is not None and (tags_needed or 'duration' not in metadata):
             try:
                 video = MutagenFile(file_path)
                 if video is not None:
-                    # Extract audio track metadata if present
-                    if hasattr(video, 'tags') and video.tags:
-                        tags = video.tags
-                        
-                        # Try different tag formats
-                        for title_tag in ['TIT2', 'title', '\xa9nam', 'Title']:
-                            if title_tag in tags:
-                                metadata['title'] = str(tags[title_tag])
-                                break
-                        
-                        for artist_tag in ['TPE1', 'artist', '\xa9ART', 'Artist']:
-                            if artist_tag in tags:
-                                metadata['artist'] = str(tags[artist_tag])
-                                break
-                    
+                    # Extract audio track metadata if present: one pass
+                    # over the tags against the precomputed reverse map
+                    if tags_needed and hasattr(video, 'tags') and video.tags:
+                        for tag_name, value in video.tags.items():
+                            field = _TAG_TO_FIELD.get(tag_name)
+                            if field not in ('title', 'artist') or field in metadata:
+                                continue
+                            if fields is not None and field not in fields:
+                                continue
+                            metadata[field] = str(value)
+
                     # Duration
-                    if hasattr(video, 'info') and hasattr(video.info, 'length'):
+                    if ((fields is None or 'duration' in fields) and
+                            'duration' not in metadata and
+                            hasattr(video, 'info') and hasattr(video.info, 'length')):
                         metadata['duration'] = int(video.info.length)
             except Exception:
                 pass
-        
+
+        return metadata
+
+    @staticmethod
+    def _probe_video(file_path: str) -> Dict[str, Any]:
+        """Read container metadata via ffprobe without decoding frames"""
+        metadata = {}
+
+        try:
+            result = subprocess.run(
+                [_FFPROBE, '-v', 'quiet', '-print_format', 'json',
+                 '-show_format', '-show_streams', file_path],
+                capture_output=True, timeout=30)
+            if result.returncode != 0:
+                return metadata
+            info = json.loads(result.stdout)
+        except (OSError, subprocess.SubprocessError, ValueError):
+            return metadata
+
+        fmt = info.get('format', {})
+        if fmt.get('duration'):
+            metadata['duration'] = int(float(fmt['duration']))
+        if fmt.get('bit_rate'):
+            metadata['bitrate'] = int(fmt['bit_rate'])
+
+        # Container-level tags (e.g. MP4 title/artist)
+        for tag_name, value in fmt.get('tags', {}).items():
+            field = _TAG_TO_FIELD.get(tag_name.lower())
+            if field in ('title', 'artist') and field not in metadata:
+                metadata[field] = str(value)
+
+        for stream in info.get('streams', []):
+            if stream.get('codec_type') == 'video':
+                if stream.get('width'):
+                    metadata['width'] = stream['width']
+                if stream.get('height'):
+                    metadata['height'] = stream['height']
+                if stream.get('codec_name'):
+                    metadata['codec'] = stream['codec_name']
+                break
+
         return metadata
     
     @staticmethod
@@ -150,27 +328,32 @@ class MetadataExtractor:
         """Extract metadata from image files"""
         metadata = {}
         
-        if not HAS_PIL:
+        Image = _pil_image()
+        if Image is None:
             return metadata
-        
+
         try:
             with Image.open(file_path) as img:
                 metadata['width'] = img.width
                 metadata['height'] = img.height
                 metadata['format'] = img.format
                 
-                # Extract EXIF data if available
+                # Extract EXIF data if available; look up only the tags
+                # in _WANTED_EXIF by numeric id instead of walking the
+                # whole EXIF mapping
                 exif_data = img.getexif()
                 if exif_data:
-                    for tag_id, value in exif_data.items():
-                        tag = TAGS.get(tag_id, tag_id)
+                    for tag_id, tag in _WANTED_EXIF.items():
+                        value = exif_data.get(tag_id)
+                        if not value:
+                            continue
                         if tag == 'DateTime':
-                            try:
-                                dt = datetime.strptime(value, '%Y:%m:%d %H:%M:%S')
-                                metadata['date'] = dt.strftime('%Y-%m-%d')
-                                metadata['time'] = dt.strftime('%H-%M-%S')
-                            except:
-                                pass
+                            # EXIF DateTime is rigidly 'YYYY:MM:DD HH:MM:SS';
+                            # slicing skips strptime's format re-parse, but
+                            # only after the layout check strptime gave us
+                            if isinstance(value, str) and _valid_exif_datetime(value):
+                                metadata['date'] = f"{value[0:4]}-{value[5:7]}-{value[8:10]}"
+                                metadata['time'] = f"{value[11:13]}-{value[14:16]}-{value[17:19]}"
                         elif tag == 'ImageDescription':
                             metadata['title'] = value
         except Exception as e:
@@ -179,61 +362,88 @@ class MetadataExtractor:
         return metadata
     
     @staticmethod
-    def _extract_audio_metadata(file_path: str) -> Dict[str, Any]:
-        """Extract metadata from audio files"""
+    def _open_audio(file_path: str, parse_tags: bool = True):
+        """
+        Open a file with mutagen, optionally skipping tag parsing
+
+        For MP3 files the ID3 frame decode can be bypassed entirely
+        when only stream info (e.g. duration) is needed.
+        """
+        if not parse_tags and file_path.lower().endswith('.mp3'):
+            from mutagen.mp3 import MP3
+            return MP3(file_path, ID3=lambda *args, **kwargs: None)
+        return _mutagen_file()(file_path)
+
+    @staticmethod
+    def _extract_audio_metadata(file_path: str, fields: Optional[Set[str]] = None) -> Dict[str, Any]:
+        """
+        Extract metadata from audio files
+
+        Args:
+            file_path: Path to the file
+            fields: Optional set of field names to extract; None means all.
+                Restricting to {'duration'} skips tag decoding where the
+                format allows it.
+        """
         metadata = {}
-        
-        if not HAS_MUTAGEN:
+
+        if _mutagen_file() is None:
             return metadata
-        
+
+        tags_needed = fields is None or bool(fields - {'duration'})
+
         try:
-            audio = MutagenFile(file_path)
+            audio = MetadataExtractor._open_audio(file_path, parse_tags=tags_needed)
             if audio is not None:
-                # Common tags across formats
-                if hasattr(audio, 'tags') and audio.tags:
-                    tags = audio.tags
-                    
-                    # Try different tag formats
-                    for title_tag in ['TIT2', 'title', '\xa9nam']:
-                        if title_tag in tags:
-                            metadata['title'] = str(tags[title_tag])
-                            break
-                    
-                    for artist_tag in ['TPE1', 'artist', '\xa9ART']:
-                        if artist_tag in tags:
-                            metadata['artist'] = str(tags[artist_tag])
-                            break
-                    
-                    for album_tag in ['TALB', 'album', '\xa9alb']:
-                        if album_tag in tags:
-                            metadata['album'] = str(tags[album_tag])
-                            break
-                    
-                    for year_tag in ['TDRC', 'date', '\xa9day']:
-                        if year_tag in tags:
-                            metadata['year'] = str(tags[year_tag])
-                            break
-                
+                # Common tags across formats: one pass over the tags
+                # against the precomputed reverse map
+                if tags_needed and hasattr(audio, 'tags') and audio.tags:
+                    for tag_name, value in audio.tags.items():
+                        field = _TAG_TO_FIELD.get(tag_name)
+                        if field is None or field in metadata:
+                            continue
+                        if fields is not None and field not in fields:
+                            continue
+                        metadata[field] = str(value)
+
                 # Duration
-                if hasattr(audio, 'info') and hasattr(audio.info, 'length'):
+                if ((fields is None or 'duration' in fields) and
+                        hasattr(audio, 'info') and hasattr(audio.info, 'length')):
                     metadata['duration'] = int(audio.info.length)
         except Exception as e:
             pass
-        
+
         return metadata
     
     @staticmethod
-    def _extract_pdf_metadata(file_path: str) -> Dict[str, Any]:
-        """Extract metadata from PDF files"""
+    def _extract_pdf_metadata(file_path: str, fields: Optional[Set[str]] = None) -> Dict[str, Any]:
+        """
+        Extract metadata from PDF files
+
+        Args:
+            file_path: Path to the file
+            fields: Optional set of field names to extract; None means all.
+                The page count is only resolved when requested, since it
+                forces the reader to flatten the page tree.
+        """
         metadata = {}
-        
-        if not HAS_PYPDF2:
+
+        PdfReader = _pdf_reader()
+        if PdfReader is None:
             return metadata
-        
+
         try:
-            with open(file_path, 'rb') as f:
-                pdf = PdfReader(f)
-                
+            # PDF parsing issues many tiny reads/seeks; small files are
+            # slurped into memory, large ones get a 1 MiB buffer
+            if os.path.getsize(file_path) < 8 * 1024 * 1024:
+                with open(file_path, 'rb') as f:
+                    source = io.BytesIO(f.read())
+            else:
+                source = open(file_path, 'rb', buffering=1 << 20)
+
+            with source as f:
+                pdf = PdfReader(f, strict=False)
+
                 if pdf.metadata:
                     if pdf.metadata.title:
                         metadata['title'] = pdf.metadata.title
@@ -241,9 +451,10 @@ class MetadataExtractor:
                         metadata['author'] = pdf.metadata.author
                     if pdf.metadata.subject:
                         metadata['subject'] = pdf.metadata.subject
-                
-                metadata['pages'] = len(pdf.pages)
+
+                if fields is None or 'pages' in fields:
+                    metadata['pages'] = len(pdf.pages)
         except Exception as e:
             pass
-        
+
         return metadata
@@ -2,17 +2,92 @@
 File system monitoring for DL_Assistant
 """
 import os
+import sys
 import time
+import queue
 import logging
-from pathlib import Path
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from typing import Callable, Optional
-from watchdog.observers import Observer
-from watchdog.events import FileSystemEventHandler, FileCreatedEvent
+from watchdog.events import FileSystemEventHandler
+
+try:
+    import fcntl
+except ImportError:
+    # Windows: no flock; the ready check falls back to a settle wait
+    fcntl = None
+
+# Pin the inotify backend on Linux: it skips watchdog's backend probe
+# and is the only one that emits the close events on_closed relies on.
+# Other platforms keep watchdog's auto-selected native backend.
+if sys.platform.startswith('linux'):
+    try:
+        from watchdog.observers.inotify import InotifyObserver as Observer
+    except ImportError:
+        from watchdog.observers import Observer
+else:
+    from watchdog.observers import Observer
+
+try:
+    from watchdog.events import FileClosedEvent
+except ImportError:
+    FileClosedEvent = None
 
 from .file_manager import FileManager
 
 logger = logging.getLogger(__name__)
 
+# inotify delivers IN_CLOSE_WRITE, so on Linux we can wake exactly when
+# the writer closes the file instead of polling its size
+_HAS_CLOSE_EVENTS = sys.platform.startswith('linux') and FileClosedEvent is not None
+
+# Suffix of the per-file in-progress sentinel
+_LOCK_SUFFIX = '.dl_lock'
+
+# How long a created file may wait for its close event before the
+# rescue sweep falls back to the polling readiness check
+_PENDING_TIMEOUT = 10.0
+_PENDING_SWEEP_INTERVAL = 5.0
+
+
+class DestinationIndex:
+    """
+    Size-keyed index of the files in a destination folder
+
+    Built with one directory pass on first use and updated
+    incrementally as files are moved in or deleted, so per-file
+    duplicate checks never rescan the folder.
+    """
+
+    def __init__(self, entries):
+        """
+        Build the index from (path, stat_result) pairs
+
+        Args:
+            entries: Iterable of (path, stat_result) tuples
+        """
+        self._lock = threading.Lock()
+        self._by_size = {}
+        for path, st in entries:
+            self._by_size.setdefault(st.st_size, []).append(path)
+
+    def lookup(self, size: int) -> list:
+        """Paths of indexed files with the given size"""
+        with self._lock:
+            return list(self._by_size.get(size, ()))
+
+    def add(self, path: str, size: int) -> None:
+        """Record a file moved into the folder"""
+        with self._lock:
+            self._by_size.setdefault(size, []).append(path)
+
+    def remove(self, path: str, size: int) -> None:
+        """Drop a deleted file from the index"""
+        with self._lock:
+            paths = self._by_size.get(size)
+            if paths and path in paths:
+                paths.remove(path)
+
 
 class DownloadHandler(FileSystemEventHandler):
     """Handles file system events in the downloads folder"""
@@ -30,35 +105,219 @@ class DownloadHandler(FileSystemEventHandler):
         self.config = config
         self.file_manager = file_manager
         self.process_callback = process_callback
-        self.processing = set()  # Track files being processed
-    
+        self.reload()
+        # Files created but not yet closed by their writer (close-event
+        # platforms only), mapped to when they were first seen
+        self._awaiting_close = {}
+        self._stop_event = threading.Event()
+        # Size index per destination folder, so the duplicate check can
+        # skip hashing when no size collision exists
+        self._dest_indexes = {}
+        self._index_build_lock = threading.Lock()
+        # Hashing and moving can take seconds per file; hand ready files
+        # to worker threads so event dispatch returns immediately
+        self._work_q = queue.Queue(maxsize=1024)
+        self._workers = []
+        for _ in range(min(4, os.cpu_count() or 1)):
+            worker = threading.Thread(target=self._worker, daemon=True)
+            worker.start()
+            self._workers.append(worker)
+        # Rescue thread for pending files whose close event never comes
+        self._pending_sweeper = None
+        if _HAS_CLOSE_EVENTS:
+            self._pending_sweeper = threading.Thread(
+                target=self._sweep_pending, daemon=True)
+            self._pending_sweeper.start()
+
+    def _sweep_pending(self) -> None:
+        """
+        Rescue pending files whose close event never arrives
+
+        A file renamed into the watched folder from outside reaches
+        watchdog as a plain create (an unmatched IN_MOVED_TO), and
+        hardlinked files never emit IN_CLOSE_WRITE at all. Entries
+        stuck past the timeout fall back to the size-poll readiness
+        check and are queued, matching what the polling path would
+        have done for them.
+        """
+        while not self._stop_event.wait(_PENDING_SWEEP_INTERVAL):
+            cutoff = time.monotonic() - _PENDING_TIMEOUT
+            for file_path, first_seen in list(self._awaiting_close.items()):
+                if first_seen >= cutoff:
+                    continue
+                if self._awaiting_close.pop(file_path, None) is None:
+                    continue
+                if self._wait_for_file_ready(file_path):
+                    self._handle_ready_file(file_path)
+
+    def _destination_index(self, destination: str) -> DestinationIndex:
+        """Size index for a destination folder, built on first use"""
+        index = self._dest_indexes.get(destination)
+        if index is None:
+            with self._index_build_lock:
+                index = self._dest_indexes.get(destination)
+                if index is None:
+                    index = DestinationIndex(self.file_manager._scan_files(destination))
+                    self._dest_indexes[destination] = index
+        return index
+
+    def reload(self) -> None:
+        """
+        Refresh the config snapshot used on the event hot path
+
+        Events can arrive in bursts of thousands, so the per-event
+        filters read plain attributes instead of walking dotted config
+        keys. Call this again after changing the monitoring or
+        duplicate-detection settings.
+        """
+        # Remember which config dict the snapshot came from: reloads
+        # replace the dict, so an identity test spots staleness
+        self._snapshot_source = self.config.config
+        self._ignore_hidden = bool(self.config.get('monitoring.ignore_hidden', True))
+        self._ignore_temp = bool(self.config.get('monitoring.ignore_temp', True))
+        self._dup_enabled = bool(self.config.get('duplicate_detection.enabled', True))
+        self._keep_newest = bool(self.config.get('duplicate_detection.keep_newest', True))
+        self._quarantine_enabled = bool(self.config.get('quarantine.enabled', True))
+        # str.endswith takes a tuple and runs the whole test in C
+        self._temp_suffixes = ('.tmp', '.crdownload', '.part')
+
+    def _refresh_snapshot(self) -> None:
+        """Re-snapshot the config flags if the config was reloaded"""
+        # config.config triggers the throttled mtime check; a reload
+        # swaps in a fresh dict, which this identity test catches
+        if self.config.config is not self._snapshot_source:
+            self.reload()
+
+    def _should_ignore(self, filename: str) -> bool:
+        """Apply the configured hidden/temp-file filters to a filename"""
+        # Our own in-progress sentinels are never processed
+        if filename.endswith(_LOCK_SUFFIX):
+            return True
+
+        if self._ignore_hidden and filename.startswith('.'):
+            return True
+
+        if self._ignore_temp and filename.endswith(self._temp_suffixes):
+            return True
+
+        return False
+
     def on_created(self, event):
         """Handle file creation events"""
         if event.is_directory:
             return
-        
-        # Ignore hidden and temp files if configured
+
+        self._refresh_snapshot()
+
+        # Ignore hidden and temp files if configured. rsplit is
+        # basename without os.path's normalization; event paths always
+        # use the native separator.
         file_path = event.src_path
-        filename = os.path.basename(file_path)
-        
-        if self.config.get('monitoring.ignore_hidden', True) and filename.startswith('.'):
+
+        if self._should_ignore(file_path.rsplit(os.sep, 1)[-1]):
             return
-        
-        if self.config.get('monitoring.ignore_temp', True):
-            if filename.endswith('.tmp') or filename.endswith('.crdownload') or filename.endswith('.part'):
-                return
-        
-        # Wait a bit for the file to finish writing
+
+        if _HAS_CLOSE_EVENTS:
+            # Defer to on_closed: inotify tells us exactly when the
+            # writer is done, so there is nothing to poll for. Blocking
+            # here would stall the dispatch thread the close event
+            # arrives on.
+            self._awaiting_close[file_path] = time.monotonic()
+            return
+
+        # Fallback: wait for the file to finish writing
         self._wait_for_file_ready(file_path)
-        
-        # Process the file
-        if file_path not in self.processing:
-            self.processing.add(file_path)
+        self._handle_ready_file(file_path)
+
+    def on_closed(self, event):
+        """Handle close-after-write events (inotify IN_CLOSE_WRITE)"""
+        if event.is_directory:
+            return
+
+        file_path = event.src_path
+        if self._awaiting_close.pop(file_path, None) is not None:
+            self._handle_ready_file(file_path)
+
+    def on_deleted(self, event):
+        """Handle file deletion events"""
+        # A file deleted before its close-write arrives must not linger
+        # in the pending set
+        self._awaiting_close.pop(event.src_path, None)
+
+    def on_moved(self, event):
+        """Handle files renamed into the folder (e.g. browser .part → final)"""
+        if event.is_directory:
+            return
+
+        self._refresh_snapshot()
+
+        # A rename means the writer already finished; no waiting needed
+        self._awaiting_close.pop(event.src_path, None)
+
+        dest_path = event.dest_path
+        if self._should_ignore(dest_path.rsplit(os.sep, 1)[-1]):
+            return
+
+        self._handle_ready_file(dest_path)
+
+    def _handle_ready_file(self, file_path: str) -> None:
+        """Queue a fully-written file for processing by a worker"""
+        try:
+            self._work_q.put_nowait(file_path)
+        except queue.Full:
+            # Badly backlogged: process inline rather than drop the file
+            self._process_guarded(file_path)
+
+    def _worker(self) -> None:
+        """Pull queued files and process them until the stop sentinel"""
+        while True:
+            file_path = self._work_q.get()
+            if file_path is None:
+                break
+            self._process_guarded(file_path)
+
+    def _process_guarded(self, file_path: str,
+                         stat_result: Optional[os.stat_result] = None) -> None:
+        """
+        Process a file unless another worker already claimed it
+
+        The claim is an O_CREAT|O_EXCL sentinel next to the file: the
+        open is atomic, needs no process-wide lock, and a leftover
+        sentinel after a crash is swept at startup.
+        """
+        lock_path = file_path + _LOCK_SUFFIX
+        try:
+            fd = os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        except FileExistsError:
+            return
+        except OSError:
+            # Folder vanished or isn't writable; process without a claim
+            self.process_file(file_path, stat_result)
+            return
+
+        try:
+            self.process_file(file_path, stat_result)
+        finally:
+            os.close(fd)
             try:
-                self.process_file(file_path)
-            finally:
-                self.processing.discard(file_path)
-    
+                os.unlink(lock_path)
+            except OSError:
+                pass
+
+    def stop(self) -> None:
+        """Stop the worker threads after draining queued files"""
+        self._stop_event.set()
+        if self._pending_sweeper is not None:
+            # The sweeper may be mid-poll; it's a daemon, so don't wait
+            # longer than one sweep interval
+            self._pending_sweeper.join(timeout=_PENDING_SWEEP_INTERVAL)
+            self._pending_sweeper = None
+        for _ in self._workers:
+            self._work_q.put(None)
+        for worker in self._workers:
+            worker.join()
+        self._workers = []
+
     def _wait_for_file_ready(self, file_path: str, timeout: int = 30) -> bool:
         """
         Wait for a file to be fully written
@@ -78,44 +337,87 @@ class DownloadHandler(FileSystemEventHandler):
                 current_size = os.path.getsize(file_path)
                 if current_size == last_size and current_size > 0:
                     # Size hasn't changed, file is likely ready
-                    time.sleep(0.5)  # Extra wait to be safe
-                    return True
+                    if fcntl is None:
+                        time.sleep(0.2)  # Brief settle wait without flock
+                        return True
+                    if self._writer_released(file_path):
+                        return True
+                    # A writer still holds the file locked; keep waiting
                 last_size = current_size
                 time.sleep(1)
             except (OSError, FileNotFoundError):
                 time.sleep(1)
         
         return False
-    
-    def process_file(self, file_path: str) -> None:
+
+    @staticmethod
+    def _writer_released(file_path: str) -> bool:
+        """
+        Probe whether any writer still holds a lock on the file
+
+        A successful nonblocking flock means no cooperating writer has
+        the file open locked, so it's safe to proceed immediately
+        instead of sleeping a fixed safety margin. Most writers don't
+        flock at all, in which case the probe succeeds right away.
+        """
+        try:
+            fd = os.open(file_path, os.O_RDONLY)
+        except OSError:
+            return False
+
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            fcntl.flock(fd, fcntl.LOCK_UN)
+            return True
+        except OSError:
+            return False
+        finally:
+            os.close(fd)
+
+    def process_file(self, file_path: str, stat_result: Optional[os.stat_result] = None) -> None:
         """
         Process a new file
-        
+
         Args:
             file_path: Path to the file
+            stat_result: Optional pre-fetched stat for the file, so bulk
+                scans don't pay a second stat() per entry
         """
         logger.info(f"Processing file: {file_path}")
-        
+
+        self._refresh_snapshot()
+
         try:
-            # Check if file still exists
-            if not os.path.exists(file_path):
-                return
+            # One stat answers existence, size and mtime for the whole
+            # run; a caller-provided stat already covers it
+            if stat_result is None:
+                try:
+                    stat_result = os.stat(file_path)
+                except OSError:
+                    return
             
             # Get file type
             file_type = self.file_manager.get_file_type(file_path)
             logger.info(f"File type: {file_type}")
             
             # Check for duplicates
-            if self.config.get('duplicate_detection.enabled', True):
+            if self._dup_enabled:
                 destination = self.file_manager.get_destination_folder(file_type)
-                if destination:
-                    duplicates = self.file_manager.find_duplicates(file_path, destination)
+                # Only hash when the destination actually holds a
+                # same-size peer; most files have no size collision
+                candidates = (self._destination_index(destination).lookup(stat_result.st_size)
+                              if destination else [])
+                if candidates:
+                    duplicates = self.file_manager.find_duplicates(
+                        file_path, destination, stat_result, candidates)
                     if duplicates:
                         logger.info(f"Duplicate found: {duplicates[0]}")
-                        if self.config.get('duplicate_detection.keep_newest', True):
+                        if self._keep_newest:
                             # Keep the newer file
-                            if os.path.getmtime(file_path) > os.path.getmtime(duplicates[0]):
+                            if stat_result.st_mtime > os.path.getmtime(duplicates[0]):
                                 self.file_manager.delete_file(duplicates[0])
+                                self._destination_index(destination).remove(
+                                    duplicates[0], stat_result.st_size)
                                 logger.info(f"Deleted older duplicate: {duplicates[0]}")
                             else:
                                 self.file_manager.delete_file(file_path)
@@ -138,7 +440,12 @@ class DownloadHandler(FileSystemEventHandler):
                 # Move file to destination
                 new_path = self.file_manager.move_file(file_path, destination, new_filename)
                 logger.info(f"Moved to: {new_path}")
-            elif self.config.get('quarantine.enabled', True):
+                # Keep the index current so the next arrival of the
+                # same file is caught
+                index = self._dest_indexes.get(destination)
+                if index is not None:
+                    index.add(new_path, stat_result.st_size)
+            elif self._quarantine_enabled:
                 # Quarantine if destination not clear
                 new_path = self.file_manager.quarantine_file(file_path)
                 logger.info(f"Quarantined to: {new_path}")
@@ -178,7 +485,18 @@ class FileWatcher:
         
         # Create downloads folder if it doesn't exist
         os.makedirs(downloads_folder, exist_ok=True)
-        
+
+        # Sweep in-progress sentinels left behind by a crash
+        cutoff = time.time() - 3600
+        with os.scandir(downloads_folder) as it:
+            for entry in it:
+                if entry.name.endswith(_LOCK_SUFFIX):
+                    try:
+                        if entry.stat().st_mtime < cutoff:
+                            os.unlink(entry.path)
+                    except OSError:
+                        pass
+
         # Set up event handler
         self.handler = DownloadHandler(self.config, self.file_manager, process_callback)
         
@@ -194,26 +512,52 @@ class FileWatcher:
         if self.observer:
             self.observer.stop()
             self.observer.join()
+        if self.handler:
+            self.handler.stop()
+        if self.observer:
             logger.info("Stopped monitoring")
     
     def process_existing_files(self) -> None:
         """Process all existing files in the downloads folder"""
         downloads_folder = self.config.get('downloads_folder')
         
-        if not os.path.exists(downloads_folder):
+        if not self.handler or not os.path.exists(downloads_folder):
             return
-        
-        for filename in os.listdir(downloads_folder):
-            file_path = os.path.join(downloads_folder, filename)
-            
-            # Skip directories
-            if os.path.isdir(file_path):
-                continue
-            
-            # Skip hidden files if configured
-            if self.config.get('monitoring.ignore_hidden', True) and filename.startswith('.'):
-                continue
-            
-            # Process the file
-            if self.handler:
-                self.handler.process_file(file_path)
+
+        # scandir serves type and stat data from the directory read, so
+        # the sweep costs one getdents pass instead of a stat per entry
+        pending = []
+        with os.scandir(downloads_folder) as it:
+            for entry in it:
+                # Skip directories
+                if entry.is_dir(follow_symlinks=False):
+                    continue
+
+                # Skip in-progress sentinels and hidden/temp files, same
+                # as the event path
+                if self.handler._should_ignore(entry.name):
+                    continue
+
+                try:
+                    pending.append((entry.path, entry.stat(follow_symlinks=False)))
+                except OSError:
+                    continue
+
+        if not pending:
+            return
+
+        # Small files first: they clear quickly, so duplicate buckets
+        # and destination indexes fill up early in the sweep
+        pending.sort(key=lambda item: item[1].st_size)
+
+        # Go through the per-file claim so a file the running observer
+        # picks up mid-sweep is never processed twice concurrently
+        if len(pending) == 1:
+            self.handler._process_guarded(*pending[0])
+            return
+
+        # Hashing and moving release the GIL, so a small pool overlaps
+        # the per-file I/O
+        paths, stats = zip(*pending)
+        with ThreadPoolExecutor(max_workers=min(8, os.cpu_count() or 1)) as executor:
+            list(executor.map(self.handler._process_guarded, paths, stats))
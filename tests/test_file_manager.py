@@ -6,6 +6,7 @@ import tempfile
 import shutil
 import os
 from pathlib import Path
+from unittest.mock import MagicMock
 
 import sys
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
@@ -40,7 +41,10 @@ class TestFileManager(unittest.TestCase):
             'duplicate_detection': {
                 'enabled': True,
                 'compare_method': 'hash'
-            }
+            },
+            # Keep the persistent hash cache inside the test dir so runs
+            # never touch the real ~/.cache
+            'hash_cache_path': os.path.join(self.test_dir, 'hashes.db')
         }
         
         import yaml
@@ -52,6 +56,7 @@ class TestFileManager(unittest.TestCase):
     
     def tearDown(self):
         """Clean up test fixtures"""
+        self.file_manager.close()
         shutil.rmtree(self.test_dir)
     
     def test_get_file_type(self):
@@ -107,24 +112,41 @@ class TestFileManager(unittest.TestCase):
         self.assertEqual(hash1, hash2)
     
     def test_find_duplicates(self):
-        """Test duplicate detection"""
+        """Test duplicate detection and the size-bucket prefilter"""
         # Create original file
         search_dir = os.path.join(self.test_dir, 'search')
         os.makedirs(search_dir)
-        
+
+        # Make the pair bigger than the small-file threshold so the
+        # hash path (not the byte-compare fast path) is exercised
+        content = 'duplicate content' * 5000  # ~83 KiB
+
         original = os.path.join(search_dir, 'original.txt')
         with open(original, 'w') as f:
-            f.write('duplicate content')
-        
+            f.write(content)
+
         # Create duplicate
         duplicate = os.path.join(self.test_dir, 'duplicate.txt')
         with open(duplicate, 'w') as f:
-            f.write('duplicate content')
-        
+            f.write(content)
+
+        # Create 100 decoy files, every one with a unique size
+        for i in range(100):
+            with open(os.path.join(search_dir, f'decoy_{i}.txt'), 'w') as f:
+                f.write('x' * (200 + i))
+
+        # Wrap the hasher so we can count how often it actually runs
+        mock_hash = MagicMock(wraps=self.file_manager.calculate_file_hash)
+        self.file_manager.calculate_file_hash = mock_hash
+
         # Find duplicates
         duplicates = self.file_manager.find_duplicates(duplicate, search_dir)
         self.assertEqual(len(duplicates), 1)
         self.assertEqual(duplicates[0], original)
+
+        # The size prefilter must keep the decoys away from the hasher:
+        # only the target file and its single size peer are hashed
+        self.assertEqual(mock_hash.call_count, 2)
     
     def test_get_intelligent_pattern_music(self):
         """Test intelligent pattern generation for music files"""